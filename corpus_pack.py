@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""Corpus pack
+
+Store the sanitized texts of all articles in one file, so that they can be
+rescored without opening a file per article or sanitizing the texts again.
+The pack is memory mapped, and each text is decoded from the map when it is
+read; counting keywords in the decoded text is as fast as counting in the
+packed bytes (see scripts/bench_pack.py).
+
+A pack is laid out as:
+    MAGIC (8 bytes)
+    offset of the index (8 bytes, little endian)
+    the sanitized texts, encoded as UTF-8, one after another
+    the index: JSON mapping attachment keys to
+        [offset, length, has_text, stamp]
+
+The stamp (see full_text_scan.attachment_stamp) is the size and modification
+time of the PDF and the backend that read it, so that a text packed from a PDF
+that was replaced since, or with another backend, is not used.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+
+from extraction import BACKENDS, DEFAULT_BACKEND
+
+MAGIC = b"FTPACK02"
+HEADER = struct.Struct("<8sQ")
+
+
+def write_pack(pack_filename, texts):
+    """Write a pack from (key, sanitized_text, has_text, stamp) tuples.
+    Texts of a key that was already written are skipped.
+    """
+    index = {}
+    with open(pack_filename, "wb") as pack_file:
+        pack_file.write(HEADER.pack(MAGIC, 0))
+        for key, sanitized_text, has_text, stamp in texts:
+            if key in index:
+                continue
+            data = sanitized_text.encode("utf-8")
+            index[key] = [pack_file.tell(), len(data), has_text, stamp]
+            pack_file.write(data)
+        index_offset = pack_file.tell()
+        pack_file.write(json.dumps(index).encode("utf-8"))
+        pack_file.seek(0)
+        pack_file.write(HEADER.pack(MAGIC, index_offset))
+
+
+class CorpusPack:
+    """A pack opened for reading. Use as a context manager, or close it."""
+    def __init__(self, pack_filename):
+        with open(pack_filename, "rb") as pack_file:
+            self.__buffer = mmap.mmap(
+                pack_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        magic, index_offset = HEADER.unpack_from(self.__buffer)
+        if magic != MAGIC:
+            self.__buffer.close()
+            raise ValueError(
+                f"{pack_filename} is not a corpus pack, or was made by an "
+                "older version; make it again with corpus_pack.py."
+            )
+        self.__index = json.loads(self.__buffer[index_offset:])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.__buffer.close()
+
+    def __contains__(self, key):
+        return key in self.__index
+
+    def __len__(self):
+        return len(self.__index)
+
+    def keys(self):
+        """The attachment keys in the pack."""
+        return self.__index.keys()
+
+    def text(self, key):
+        """The sanitized text of an attachment."""
+        offset, length, _, _ = self.__index[key]
+        return self.__buffer[offset:offset+length].decode("utf-8")
+
+    def has_text(self, key):
+        """Could text be read from the attachment?"""
+        return self.__index[key][2]
+
+    def stamp(self, key):
+        """The stamp of the PDF the attachment's text was packed from."""
+        return self.__index[key][3]
+
+
+def main(
+        bibtex_filename, pack_filename, text_dir=None,
+        backend=DEFAULT_BACKEND,
+):
+    from full_text_scan import Article, attachment_key, attachment_stamp
+
+    if text_dir is not None:
+        text_dir = Path(text_dir).absolute()
+    pack_filename = Path(pack_filename).absolute()
+
+    with open(bibtex_filename, encoding='utf-8') as bibtex_file:
+        bib = bibtex_file.read()
+
+    old_cwd = os.getcwd()
+    p = Path(bibtex_filename)
+    os.chdir(p.parent.absolute())
+
+    articles = (
+        Article(article, text_dir=text_dir, backend=backend)
+        for article in bib.split("\n}")[:-1]
+    )
+    write_pack(
+        pack_filename,
+        (
+            (
+                attachment_key(article.filename),
+                article.sanitized_text,
+                article.text != "",
+                attachment_stamp(article.filename, backend),
+            )
+            for article in articles
+        )
+    )
+
+    os.chdir(old_cwd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack the sanitized texts of a bibtex into one file."
+    )
+    parser.add_argument(
+        'bibtex',
+        metavar='BibTeX input',
+        type=str,
+        help='BibTex input filename'
+    )
+    parser.add_argument(
+        'pack',
+        metavar='Pack output',
+        type=str,
+        help='Corpus pack output filename'
+    )
+    parser.add_argument(
+        "-t",
+        "--text-dir",
+        help="Directory to store extracted texts in and read them from",
+        default=None
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        help="How to extract the text from the PDFs",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND
+    )
+    args = parser.parse_args()
+    main(
+        bibtex_filename=args.bibtex,
+        pack_filename=args.pack,
+        text_dir=args.text_dir,
+        backend=args.backend
+    )
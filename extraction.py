@@ -0,0 +1,107 @@
+"""Extraction backends
+
+Ways of getting the text out of a PDF. Each backend takes a filename and
+returns the text; the libraries of a backend are only imported when it is
+used.
+ - textract: textract's pdftotext method (the default).
+ - pdftotext: poppler's pdftotext, with its output piped straight back.
+ - pymupdf: PyMuPDF, in process.
+ - pypdf: pypdf, in process.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+def textract_text(filename):
+    import textract
+    return textract.process(filename, method="pdftotext").decode("utf-8")
+
+
+def pdftotext_text(filename):
+    import subprocess
+    # Same command as textract runs, without textract's layers around it
+    return subprocess.run(
+        ["pdftotext", filename, "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        encoding="utf-8",
+    ).stdout
+
+
+def pymupdf_text(filename):
+    import fitz
+    with fitz.open(filename) as document:
+        # pdftotext ends every page with a form feed
+        return "".join(page.get_text() + "\f" for page in document)
+
+
+def pypdf_text(filename):
+    from pypdf import PdfReader
+    return "".join(
+        (page.extract_text() or "") + "\f"
+        for page in PdfReader(filename).pages
+    )
+
+
+BACKENDS = {
+    "textract": textract_text,
+    "pdftotext": pdftotext_text,
+    "pymupdf": pymupdf_text,
+    "pypdf": pypdf_text,
+}
+
+DEFAULT_BACKEND = "textract"
+
+# Backends that can read several PDFs at once from threads: they wait on
+# pdftotext, which runs as its own process. PyMuPDF does not support being
+# called from several threads, and pypdf would only contend for the GIL.
+PARALLEL_BACKENDS = ["textract", "pdftotext"]
+
+
+def is_available(backend):
+    """Are the libraries or programs of the backend installed?"""
+    import importlib.util
+    import shutil
+
+    if backend == "pdftotext":
+        return shutil.which("pdftotext") is not None
+    module = {
+        "textract": "textract",
+        "pymupdf": "fitz",
+        "pypdf": "pypdf",
+    }[backend]
+    return importlib.util.find_spec(module) is not None
+
+
+def extract_text(filename, backend=DEFAULT_BACKEND):
+    """The text of the PDF. If the PDF cannot be read (e.g. it is missing,
+    or pdftotext is not installed), None, which tells a failure apart from a
+    PDF without text.
+
+    A missing library of the backend is not hidden: it raises ImportError.
+    """
+    if not filename:
+        return None
+    extract = BACKENDS[backend]
+    try:
+        return extract(filename)
+    except ImportError:
+        raise
+    except Exception:
+        return None
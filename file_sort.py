@@ -1,18 +1,19 @@
 # S.Millard and C.Christiansen - Aug 2021
 
-# input excel files made for FT-scan
+# input excel files made for FT-scan, or the SQLite output of FT-scan
 # move files listed in excel file in column D into one folder together
 
 # standard library
 import argparse
 import os
 from shutil import copy
+import sqlite3
 
-# requires `pip install` in shell
-from openpyxl import load_workbook
+# define functions
+def excel_file_locations(excel_filename):
 
-# define function
-def main(excel_filename, current_dir, output_dir):
+    # requires `pip install` in shell
+    from openpyxl import load_workbook
 
     # bring in excel sheet
     book = load_workbook(excel_filename)
@@ -22,36 +23,62 @@ def main(excel_filename, current_dir, output_dir):
     # find correct column
     file_locations = sheet1['D']
 
-    # loop through column
+    return [
+        location.value.encode("cp1252").decode("utf8")
+        for location in file_locations[1:]
+        if location.value is not None
+    ]
+
+
+def sqlite_file_locations(sqlite_filename, min_count):
+
+    # files of the articles with at least min_count keywords
+    with sqlite3.connect(sqlite_filename) as connection:
+        rows = connection.execute(
+            "SELECT filename FROM articles "
+            "WHERE count >= ? AND filename != '' "
+            "ORDER BY count DESC",
+            (min_count,)
+        ).fetchall()
+    return [filename for filename, in rows]
+
+
+def main(
+        excel_filename, current_dir, output_dir,
+        sqlite_filename=None, min_count=10
+):
+
+    if sqlite_filename is not None:
+        file_locations = sqlite_file_locations(sqlite_filename, min_count)
+    else:
+        file_locations = excel_file_locations(excel_filename)
+
+    # loop through file locations
     count = 0
 
     ## get current file location
-    for location in file_locations[1:]:
-        if location.value is not None:
-            count = count+1
-            #print(location.value)
-
-            current_location = (
-                current_dir +
-                location.value.encode("cp1252").decode("utf8")
-            )
-            #print(current_location)
-
-            ## check location exists
-            if os.path.isfile(current_location) is True:
-
-                ## copy file to new directory
-                copy(current_location, output_dir)
-            else:
-                print("Location of file not found for:")
-                print(current_location)
-
-            # try:
-            #     copy(current_location, output_dir)
-            # except FileNotFoundError:
-            #     print("Location of file not found for:")
-            #     print(current_location)
-            #     print(current_location.__class__)
+    for location in file_locations:
+        count = count+1
+        #print(location)
+
+        current_location = current_dir + location
+        #print(current_location)
+
+        ## check location exists
+        if os.path.isfile(current_location) is True:
+
+            ## copy file to new directory
+            copy(current_location, output_dir)
+        else:
+            print("Location of file not found for:")
+            print(current_location)
+
+        # try:
+        #     copy(current_location, output_dir)
+        # except FileNotFoundError:
+        #     print("Location of file not found for:")
+        #     print(current_location)
+        #     print(current_location.__class__)
 
     # finished!
     print(count)
@@ -70,6 +97,8 @@ if __name__ == "__main__": # this is used when you call script from the shell
         'excel',
         metavar='Excel input',
         type=str,
+        nargs="?",
+        default=None,
         help='Excel with locations of separated files'
     )
     parser.add_argument(
@@ -84,13 +113,28 @@ if __name__ == "__main__": # this is used when you call script from the shell
         help="Directory - where to save the files",
         default=None
     )
+    parser.add_argument(
+        "-s",
+        "--sqlite",
+        help="SQLite output of full_text_scan.py, instead of the excel",
+        default=None
+    )
+    parser.add_argument(
+        "-n",
+        "--min_count",
+        help="With --sqlite - move files with at least this keyword count",
+        type=int,
+        default=10
+    )
     args = parser.parse_args()
+    if args.excel is None and args.sqlite is None:
+        parser.error("Either an excel or --sqlite input is needed.")
 
     # calling the function
     main(
         excel_filename=args.excel,
         current_dir=args.current_dir,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        sqlite_filename=args.sqlite,
+        min_count=args.min_count
     )
-
-
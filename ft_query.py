@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""Full text query
+
+Quick entry point for work that does not need the PDFs to be read: listing
+the articles of a bibtex and scoring texts that were already extracted into
+a text directory (see `full_text_scan.py --text-dir`) or a corpus pack (see
+`corpus_pack.py`). Attachments without a stored text are still read, which is
+the only time textract is loaded.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import sys
+
+from extraction import BACKENDS, DEFAULT_BACKEND
+import full_text_scan
+from full_text_scan import Article
+
+
+def list_articles(bibtex_filename, output=sys.stdout):
+    """Print the title, author, year and filename of every article."""
+    with open(bibtex_filename, encoding='utf-8') as bibtex_file:
+        bib = bibtex_file.read()
+
+    output.write("title;author;year;filename\n")
+    for raw_data in bib.split("\n}")[:-1]:
+        article = Article(raw_data)
+        output.write(
+            f"{article.title};"
+            f"{article.author};"
+            f"{article.year};"
+            f"{article.filename}\n"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="List and score articles without reading the PDFs."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser(
+        "list", help="List the articles of a bibtex"
+    )
+    list_parser.add_argument(
+        'bibtex',
+        metavar='BibTeX input',
+        type=str,
+        help='BibTex input filename'
+    )
+
+    score_parser = subparsers.add_parser(
+        "score", help="Score stored texts and write the outputs"
+    )
+    score_parser.add_argument(
+        'bibtex',
+        metavar='BibTeX input',
+        type=str,
+        help='BibTex input filename'
+    )
+    score_parser.add_argument(
+        "-t",
+        "--text-dir",
+        help="Directory with the extracted texts",
+        default=None
+    )
+    score_parser.add_argument(
+        "-p",
+        "--pack",
+        help="Corpus pack with the sanitized texts",
+        default=None
+    )
+    score_parser.add_argument(
+        "-k",
+        "--profile",
+        help=(
+            "Keyword profile (JSON) to score against. "
+            "Can be given more than once."
+        ),
+        action="append",
+        default=None
+    )
+    score_parser.add_argument(
+        "-b",
+        "--backend",
+        help="How to extract the text of PDFs without a stored text",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND
+    )
+    score_parser.add_argument(
+        "-m",
+        "--markdown",
+        help="Markdown output",
+        default=None
+    )
+    score_parser.add_argument(
+        "-c",
+        "--csv",
+        help="CSV output",
+        default=None
+    )
+
+    args = parser.parse_args()
+    if args.command == "list":
+        list_articles(bibtex_filename=args.bibtex)
+    elif args.command == "score":
+        full_text_scan.main(
+            bibtex_filename=args.bibtex,
+            markdown=args.markdown,
+            csv=args.csv,
+            text_dir=args.text_dir,
+            pack=args.pack,
+            profiles=args.profile,
+            backend=args.backend
+        )
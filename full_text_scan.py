@@ -32,11 +32,24 @@ __email__ = "christian dot l dot christiansen at gmail dot com"
 __status__ = "Development"
 
 import argparse
+from contextlib import ExitStack
+import hashlib
+import json
 from pathlib import Path
 import os
 import re
-import textract  # to extract the text from pdf
-from unidecode import unidecode
+
+from extraction import (
+    BACKENDS,
+    DEFAULT_BACKEND,
+    PARALLEL_BACKENDS,
+    extract_text,
+)
+
+# The extraction libraries (to extract the text from pdf) and unidecode are
+# imported where they are used, as are the modules that only main() needs
+# (the corpus pack, scheduler and sorted output), so that scripts which only
+# read the bibtex or stored texts start quickly.
 
 
 # DEFAULT_KEYWORDS = [
@@ -133,14 +146,149 @@ EXCLUDE_MINOR_KEYWORDS = [
 ]
 
 
+def keyword_sentences(text, keywords):
+    """All lines of the text that include keywords, with the keywords
+    highlighted in markdown bold.
+    """
+    def is_highlight(line, keyword):
+        """Determine if there's a keyword to be highlighted in the
+        line.
+        """
+        line = line.replace("**"+keyword.lower()+"**", "").lower()
+        if keyword in line:
+            return True
+        else:
+            False
+
+    def highlight(line, keyword):
+        def add_highlight(line, start, end):
+            return "".join([
+                line[:start],
+                "**", line[start:end], "**",
+                line[end:]
+            ])
+
+        for _ in range(line.lower().count(keyword)):
+            start = line.lower().index(keyword.lstrip())
+            end = start + len(keyword.strip())
+            try:
+                if line[start-2:start] != "**":
+                    line = add_highlight(line, start, end)
+            except IndexError:
+                line = add_highlight(line, start, end)
+        return line
+
+    sentences = ""
+    for line in text.split("\n"):
+        add_line = False
+        line_to_add = line
+        for keyword in keywords:
+            if is_highlight(line_to_add, keyword):
+                add_line = True
+                line_to_add = highlight(line_to_add, keyword)
+        if add_line:
+            sentences += line_to_add+"\n\n"
+    return sentences
+
+
+def article_sort(article):
+    """Sort key for articles: keyword count, then year, author and title."""
+    return (
+        article.keywords_count,
+        article.year,
+        article.author,
+        article.title
+    )
+
+
+def attachment_key(filename):
+    """Key of an attachment in the text store."""
+    return hashlib.sha1(filename.encode("utf-8")).hexdigest()
+
+
+def attachment_stamp(filename, backend):
+    """What the text of an attachment depends on besides its filename: the
+    size and modification time of the PDF, and the backend that reads it, as
+    a list. If the PDF cannot be found, None.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns, backend]
+
+
+def stored_text_path(text_dir, filename, backend):
+    """Where the text of an attachment, extracted with the backend, is
+    stored. The size and modification time of the PDF are part of the name,
+    so a PDF that was replaced is read again. If the PDF cannot be found,
+    None.
+    """
+    stamp = attachment_stamp(filename, backend)
+    if stamp is None:
+        return None
+    size, mtime_ns, _ = stamp
+    key = hashlib.sha1(
+        f"{filename}\0{backend}\0{size}\0{mtime_ns}".encode("utf-8")
+    ).hexdigest()
+    return Path(text_dir).joinpath(key+".txt")
+
+
+def read_stored_text(text_dir, filename, backend):
+    """The stored text of an attachment. If it was not stored, None."""
+    path = stored_text_path(text_dir, filename, backend)
+    if path is None:
+        return None
+    try:
+        return path.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def store_text(text_dir, filename, backend, text):
+    """Store the text extracted from an attachment.
+
+    The text is written to a temporary file that is then moved into place, so
+    a run that is killed while writing does not leave a truncated text.
+    """
+    import tempfile
+
+    path = stored_text_path(text_dir, filename, backend)
+    if path is not None:
+        Path(text_dir).mkdir(parents=True, exist_ok=True)
+        tmp_file = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=text_dir, suffix=".tmp", delete=False
+        )
+        try:
+            with tmp_file:
+                tmp_file.write(text)
+            os.replace(tmp_file.name, path)
+        except BaseException:
+            os.unlink(tmp_file.name)
+            raise
+
+
+# Header of the CSV output, matching the fields of Article.as_csv
+CSV_HEADER = "title;author;year;filename;count"
+
+
 class Article:
     """An article, as defined in a bibtex file."""
     def __init__(
             self, raw_data, *,
             keywords=None, ignore_keywords=None,
             exclude_major_keywords=None, exclude_minor_keywords=None,
+            text_dir=None, pack=None, backend=DEFAULT_BACKEND,
     ):
-        """An article is instantiated from the contents of a bibtex file."""
+        """An article is instantiated from the contents of a bibtex file.
+
+        If a text_dir is given, the extracted text of the attachment is read
+        from there, and stored there after the attachment has been read
+        successfully.
+        If a corpus pack is given, the sanitized text is taken from the pack
+        when the attachment is in it. The backend is the name of the
+        extraction backend that reads the attachment (see extraction.py).
+        """
         self.__raw_data = raw_data
         self.keywords = keywords if keywords is not None else []
         if ignore_keywords is not None:
@@ -155,13 +303,19 @@ class Article:
             self.exclude_minor_keywords = exclude_minor_keywords
         else:
             self.exclude_minor_keywords = []
+        self.text_dir = text_dir
+        self.pack = pack
+        self.backend = backend
         self.__author = None
         self.__title = None
         self.__year = None
         self.__filename = None
         self.__text = None
+        self.__extracted = False
         self.__sanitized_text = None
+        self.__in_pack = None
         self.__keywords_count = None
+        self.__counts_per_keyword = None
 
         # self.text # Initialise getting the text
 
@@ -260,27 +414,76 @@ class Article:
     @property
     def text(self):
         """The text from the attachment."""
-        def get_text(filename):
-            try:
-                return textract.process(
-                    filename, method="pdftotext"
-                ).decode("utf-8")
-            except Exception:
-                return ""
+        if self.__text is None and self.text_dir is not None:
+            self.__text = read_stored_text(
+                self.text_dir, self.filename, self.backend
+            )
         if self.__text is None:
-            self.__text = get_text(self.filename)
+            self.__extracted = True
+            text = extract_text(self.filename, self.backend)
+            if text is None:
+                # Not stored, so that the PDF is tried again next time
+                self.__text = ""
+            else:
+                self.__text = text
+                if self.text_dir is not None:
+                    store_text(
+                        self.text_dir, self.filename, self.backend, text
+                    )
         return self.__text
 
+    @property
+    def extracted(self):
+        """Was the PDF read to get the text (rather than the text store)?"""
+        return self.__extracted
+
+    @property
+    def is_stored(self):
+        """Is the text of the attachment in the text store?"""
+        if self.text_dir is None:
+            return False
+        path = stored_text_path(self.text_dir, self.filename, self.backend)
+        return path is not None and path.exists()
+
     @property
     def sanitized_text(self):
         """Sanitize the text for the computer."""
         def sanitize_text(text):
             """Remove newlines and set all of the text to lowercase."""
+            from unidecode import unidecode
             return unidecode(text).replace("\n", " ").lower()
+        if self.__sanitized_text is None and self.in_pack:
+            self.__sanitized_text = self.pack.text(
+                attachment_key(self.filename)
+            )
         if self.__sanitized_text is None:
             self.__sanitized_text = sanitize_text(self.text)
         return self.__sanitized_text
 
+    @property
+    def in_pack(self):
+        """Is the attachment in the corpus pack, packed from the same PDF
+        with the same backend? A PDF that was replaced since, or a pack made
+        with another backend, is not used.
+        """
+        if self.__in_pack is None:
+            key = attachment_key(self.filename)
+            self.__in_pack = (
+                self.pack is not None
+                and key in self.pack
+                and self.pack.stamp(key) == attachment_stamp(
+                    self.filename, self.backend
+                )
+            )
+        return self.__in_pack
+
+    @property
+    def has_text(self):
+        """Could text be read from the attachment?"""
+        if self.__text is None and self.in_pack:
+            return self.pack.has_text(attachment_key(self.filename))
+        return self.text != ""
+
     @property
     def keywords_count(self):
         """How many instances of keywords appear in the text?"""
@@ -292,73 +495,76 @@ class Article:
         def sanity_check(text):
             return get_kw_count(text, [" the ", " a "]) >= 10
 
+        def list_count(name):
+            # From counts_per_keyword, so that the SQLite output does not
+            # count every keyword again
+            return sum(self.counts_per_keyword[name].values())
+
         if self.__keywords_count is None:
-            if get_kw_count(
-                self.sanitized_text, self.exclude_major_keywords
-            ) >= 10:
+            if list_count("exclude_major_keywords") >= 10:
                 self.__keywords_count = -4
-            elif get_kw_count(
-                self.sanitized_text, self.exclude_minor_keywords
-            ) >= 100:
+            elif list_count("exclude_minor_keywords") >= 100:
                 self.__keywords_count = -3
             else:
-                self.__keywords_count = get_kw_count(
-                    self.sanitized_text, self.keywords
-                ) - get_kw_count(
-                    self.sanitized_text, self.ignore_keywords
+                self.__keywords_count = (
+                    list_count("keywords") - list_count("ignore_keywords")
                 )
                 if self.__keywords_count == 0:
-                    if self.text == "":
+                    if not self.has_text:
                         self.__keywords_count = -2
                     elif not sanity_check(self.sanitized_text):
                         self.__keywords_count = -1
         return self.__keywords_count
 
+    @property
+    def counts_per_keyword(self):
+        """How many times each keyword appears in the text, per keyword
+        list. The keywords of a list are unique (see profile_lists), so the
+        counts of a list add up to its total in keywords_count.
+        """
+        if self.__counts_per_keyword is None:
+            self.__counts_per_keyword = {
+                name: {
+                    keyword: self.sanitized_text.count(keyword)
+                    for keyword in keywords
+                }
+                for name, keywords in [
+                    ("keywords", self.keywords),
+                    ("ignore_keywords", self.ignore_keywords),
+                    ("exclude_major_keywords", self.exclude_major_keywords),
+                    ("exclude_minor_keywords", self.exclude_minor_keywords),
+                ]
+            }
+        return self.__counts_per_keyword
+
+    def rescored(
+            self, *,
+            keywords=None, ignore_keywords=None,
+            exclude_major_keywords=None, exclude_minor_keywords=None,
+    ):
+        """A copy of the article scored against other keywords. The text is
+        shared with this article, so the attachment is only read once.
+        """
+        article = Article(
+            self.__raw_data,
+            keywords=keywords,
+            ignore_keywords=ignore_keywords,
+            exclude_major_keywords=exclude_major_keywords,
+            exclude_minor_keywords=exclude_minor_keywords,
+            text_dir=self.text_dir,
+            pack=self.pack,
+            backend=self.backend,
+        )
+        article.__filename = self.filename
+        article.__sanitized_text = self.sanitized_text
+        article.__in_pack = self.__in_pack
+        article.__text = self.__text
+        return article
+
     def as_markdown(self):
         """Output in a markdown format, showing all sentences that include
         keywords.
         """
-        def keyword_sentences(text, keywords):
-            def is_highlight(line, keyword):
-                """Determine if there's a keyword to be highlighted in the
-                line.
-                """
-                line = line.replace("**"+keyword.lower()+"**", "").lower()
-                if keyword in line:
-                    return True
-                else:
-                    False
-
-            def highlight(line, keyword):
-                def add_highlight(line, start, end):
-                    return "".join([
-                        line[:start],
-                        "**", line[start:end], "**",
-                        line[end:]
-                    ])
-
-                for _ in range(line.lower().count(keyword)):
-                    start = line.lower().index(keyword.lstrip())
-                    end = start + len(keyword.strip())
-                    try:
-                        if line[start-2:start] != "**":
-                            line = add_highlight(line, start, end)
-                    except IndexError:
-                        line = add_highlight(line, start, end)
-                return line
-
-            sentences = ""
-            for line in text.split("\n"):
-                add_line = False
-                line_to_add = line
-                for keyword in keywords:
-                    if is_highlight(line_to_add, keyword):
-                        add_line = True
-                        line_to_add = highlight(line_to_add, keyword)
-                if add_line:
-                    sentences += line_to_add+"\n\n"
-            return sentences
-
         return (
             f"# Title: {self.title}\n"
             f"**Author:** {self.author}\n"
@@ -389,15 +595,133 @@ class Article:
         ])+"\n}\n"
 
 
-def main(bibtex_filename, markdown=None, csv=None):
-    def article_sort(article):
-        return (
-            article.keywords_count,
-            article.year,
-            article.author,
-            article.title
+# Keyword lists of a profile, with their defaults
+PROFILE_LISTS = {
+    "keywords": DEFAULT_KEYWORDS,
+    "ignore_keywords": IGNORE_KEYWORDS,
+    "exclude_major_keywords": EXCLUDE_MAJOR_KEYWORDS,
+    "exclude_minor_keywords": EXCLUDE_MINOR_KEYWORDS,
+}
+
+
+def profile_lists(profile, source):
+    """The keyword lists of a profile (a dict of list names to keywords),
+    with the defaults for lists that are left out. The source names the
+    profile in errors.
+    """
+    unknown = set(profile) - set(PROFILE_LISTS)
+    if unknown:
+        raise ValueError(
+            f"Unknown keyword lists in {source}: "
+            + ", ".join(sorted(unknown))
+        )
+    for list_name, keywords in profile.items():
+        if not (
+            isinstance(keywords, list)
+            and all(isinstance(keyword, str) for keyword in keywords)
+        ):
+            raise ValueError(
+                f"{list_name} in {source} should be a list of strings."
+            )
+        duplicates = {
+            keyword for keyword in keywords if keywords.count(keyword) > 1
+        }
+        if duplicates:
+            # A repeated keyword would be counted twice in the total
+            raise ValueError(
+                f"{list_name} in {source} repeats keywords: "
+                + ", ".join(sorted(duplicates))
+            )
+    return {
+        list_name: profile.get(list_name, default)
+        for list_name, default in PROFILE_LISTS.items()
+    }
+
+
+def load_profile(profile_filename):
+    """Load a keyword profile from a JSON file. Returns the name of the
+    profile (its "name", or else the filename without extension) and its
+    keyword lists. Lists that are not in the file are the defaults.
+    """
+    with open(profile_filename, encoding="utf-8") as profile_file:
+        profile = json.load(profile_file)
+    if not isinstance(profile, dict):
+        raise ValueError(f"{profile_filename} should hold a JSON object.")
+    name = profile.pop("name", Path(profile_filename).stem)
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"The name in {profile_filename} should be a string.")
+    return name, profile_lists(profile, profile_filename)
+
+
+def profile_filename(filename, name):
+    """Output filename for a profile, e.g. results.csv -> results.name.csv"""
+    p = Path(filename)
+    return p.with_name(f"{p.stem}.{name}{p.suffix}")
+
+
+def main(
+        bibtex_filename, markdown=None, csv=None, text_dir=None, sqlite=None,
+        pack=None, profiles=None, backend=DEFAULT_BACKEND,
+        workers=1, max_heavy=1, timings=None,
+):
+    """Scan the articles of the bibtex. If profile filenames are given, the
+    articles are scored against each profile and every output is written
+    once per profile, with the profile name added to the filename.
+
+    Articles are not kept once their outputs have been added; the outputs
+    are sorted on disk and merged when all articles have been scanned.
+
+    With more than one worker, or a timings file to learn from, the texts
+    are loaded in parallel, longest predicted first (see scheduler.py). The
+    outputs are the same as when the articles are scanned in order.
+    """
+    from corpus_pack import CorpusPack
+    from scheduler import CostModel, Job, schedule
+    from sorted_output import SortedOutput
+
+    if workers > 1 and backend not in PARALLEL_BACKENDS:
+        # In process backends are not safe, or not faster, in threads
+        raise ValueError(
+            f"The {backend} backend reads one PDF at a time; use -j 1 or "
+            "one of: " + ", ".join(PARALLEL_BACKENDS)
         )
 
+    def absolute(filename):
+        return Path(filename).absolute() if filename else filename
+
+    text_dir = absolute(text_dir)
+    timings = absolute(timings)
+    outputs = {
+        "markdown": absolute(markdown),
+        "csv": absolute(csv),
+        "sqlite": absolute(sqlite),
+    }
+    if profiles:
+        profiles = [load_profile(profile) for profile in profiles]
+        names = [name for name, _ in profiles]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            # Their outputs would overwrite each other
+            raise ValueError(
+                "Profile names should be unique: "
+                + ", ".join(sorted(duplicates))
+            )
+        runs = [
+            (
+                keyword_lists,
+                {
+                    output: profile_filename(filename, name)
+                    if filename else filename
+                    for output, filename in outputs.items()
+                }
+            )
+            for name, keyword_lists in profiles
+        ]
+    else:
+        runs = [(PROFILE_LISTS, outputs)]
+    if pack is not None:
+        pack = CorpusPack(pack)
+
     with open(bibtex_filename, encoding='utf-8') as bibtex_file:
         bib = bibtex_file.read()
 
@@ -405,33 +729,75 @@ def main(bibtex_filename, markdown=None, csv=None):
     p = Path(bibtex_filename)
     os.chdir(p.parent.absolute())
 
-    articles = sorted(
-        [
-            Article(
-                article,
-                keywords=DEFAULT_KEYWORDS,
-                ignore_keywords=IGNORE_KEYWORDS,
-                exclude_major_keywords=EXCLUDE_MAJOR_KEYWORDS,
-                exclude_minor_keywords=EXCLUDE_MINOR_KEYWORDS,
-            )
-            for article in bib.split("\n}")[:-1]
-        ],
-        key=article_sort
-    )
+    def load(article):
+        article.sanitized_text
+        if outputs["markdown"]:
+            # The markdown needs the full text, which the rescored copies
+            # share only when it is loaded before they are made.
+            article.text
 
-    os.chdir(old_cwd)
+    def loaded(articles):
+        """The articles with their position in the bibtex, once their
+        texts are loaded.
+        """
+        if workers == 1 and timings is None:
+            for order, article in enumerate(articles):
+                load(article)
+                yield order, article
+            return
+
+        def is_cached(article):
+            """Can the article be loaded without reading its PDF?"""
+            return article.is_stored or (
+                article.in_pack and not outputs["markdown"]
+            )
 
-    if markdown:
-        with open(markdown, "w", encoding="utf-8") as markdown_file:
-            markdown_file.write(
-                "\n".join(article.as_markdown() for article in articles)
+        model = CostModel(timings)
+        # A generator, so that only the scheduler holds the jobs and each
+        # article is let go once its outputs are added.
+        jobs = (
+            Job(article, order) if is_cached(article) else
+            model.job(
+                article, order, attachment_key(article.filename),
+                article.filename
             )
+            for order, article in enumerate(articles)
+        )
+        for job, seconds in schedule(
+                jobs, load, workers=workers, max_heavy=max_heavy
+        ):
+            # Times of texts from the text store or pack say nothing about
+            # how long the PDF takes
+            if job.item.extracted:
+                model.record(job, seconds)
+            yield job.order, job.item
+        if timings is not None:
+            model.save()
+
+    with ExitStack() as stack:
+        sorted_outputs = [
+            (
+                keyword_lists,
+                stack.enter_context(SortedOutput(
+                    article_sort, csv_header=CSV_HEADER, **filenames
+                ))
+            )
+            for keyword_lists, filenames in runs
+        ]
+        articles = (
+            Article(raw_data, text_dir=text_dir, pack=pack, backend=backend)
+            for raw_data in bib.split("\n}")[:-1]
+        )
+        for order, article in loaded(articles):
+            for keyword_lists, sorted_output in sorted_outputs:
+                sorted_output.add(
+                    article.rescored(**keyword_lists), order=order
+                )
+
+    os.chdir(old_cwd)
 
-    if csv:
-        with open(csv, "w", encoding="utf-8") as csv_file:
-            csv_output = "title;author;year;filename;count\n"
-            csv_output += "\n".join(article.as_csv() for article in articles)
-            csv_file.write(csv_output)
+    if pack is not None:
+        pack.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -455,5 +821,76 @@ if __name__ == "__main__":
         help="CSV output",
         default=None
     )
+    parser.add_argument(
+        "-t",
+        "--text-dir",
+        help="Directory to store extracted texts in and read them from",
+        default=None
+    )
+    parser.add_argument(
+        "-s",
+        "--sqlite",
+        help="SQLite output, with the count of every keyword",
+        default=None
+    )
+    parser.add_argument(
+        "-p",
+        "--pack",
+        help="Corpus pack to read the sanitized texts from",
+        default=None
+    )
+    parser.add_argument(
+        "-k",
+        "--profile",
+        help=(
+            "Keyword profile (JSON) to score against, instead of the default "
+            "keywords. Can be given more than once."
+        ),
+        action="append",
+        default=None
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        help="How to extract the text from the PDFs",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help=(
+            "Number of PDFs to read at the same time (only with the "
+            "textract and pdftotext backends)"
+        ),
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        "--max-heavy",
+        help="Number of very large PDFs to read at the same time",
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        "--timings",
+        help=(
+            "File to learn from and record how long each PDF takes, to read "
+            "the longest first"
+        ),
+        default=None
+    )
     args = parser.parse_args()
-    main(bibtex_filename=args.bibtex, markdown=args.markdown, csv=args.csv)
+    main(
+        bibtex_filename=args.bibtex,
+        markdown=args.markdown,
+        csv=args.csv,
+        text_dir=args.text_dir,
+        sqlite=args.sqlite,
+        pack=args.pack,
+        profiles=args.profile,
+        backend=args.backend,
+        workers=args.jobs,
+        max_heavy=args.max_heavy,
+        timings=args.timings
+    )
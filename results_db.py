@@ -0,0 +1,136 @@
+"""Results database
+
+Write the results of a full text scan to SQLite, with the count of every
+keyword next to the total keyword count of each article.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+import sqlite3
+
+
+# articles: one row per article, as in the CSV output.
+# list_counts: total count of each keyword list per article.
+# keyword_counts: count of each keyword per article.
+SCHEMA = """
+CREATE TABLE articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    year INTEGER,
+    filename TEXT,
+    count INTEGER
+);
+CREATE TABLE list_counts (
+    article_id INTEGER REFERENCES articles(id),
+    list TEXT,
+    count INTEGER
+);
+CREATE TABLE keyword_counts (
+    article_id INTEGER REFERENCES articles(id),
+    list TEXT,
+    keyword TEXT,
+    count INTEGER
+);
+"""
+
+# Created after the rows are inserted, which is quicker than keeping them
+# up to date during the inserts.
+INDEXES = """
+CREATE INDEX articles_count ON articles(count);
+CREATE INDEX articles_year ON articles(year);
+CREATE INDEX articles_filename ON articles(filename);
+CREATE INDEX list_counts_article ON list_counts(article_id, list);
+CREATE INDEX keyword_counts_article ON keyword_counts(article_id);
+CREATE INDEX keyword_counts_keyword ON keyword_counts(keyword, count);
+"""
+
+
+def article_row(article):
+    """Everything the database holds about an article, as plain lists and
+    values, so that it can be kept outside the article (e.g. as JSON).
+    """
+    counts = article.counts_per_keyword
+    return [
+        article.title,
+        article.author,
+        article.year,
+        article.filename,
+        article.keywords_count,
+        [
+            [name, sum(keyword_counts.values())]
+            for name, keyword_counts in counts.items()
+        ],
+        [
+            [name, keyword, count]
+            for name, keyword_counts in counts.items()
+            for keyword, count in keyword_counts.items()
+        ],
+    ]
+
+
+class ResultsDB:
+    """A new results database. An existing file is replaced.
+
+    Use as a context manager; the indexes are created and the rows committed
+    when it is closed.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.__connection = None
+
+    def __enter__(self):
+        Path(self.filename).unlink(missing_ok=True)
+        self.__connection = sqlite3.connect(self.filename)
+        self.__connection.executescript(SCHEMA)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.__connection.executescript(INDEXES)
+            self.__connection.commit()
+        self.__connection.close()
+
+    def add(self, article):
+        """Add an article, with the counts of each of its keywords."""
+        self.add_row(article_row(article))
+
+    def add_row(self, row):
+        """Add an article from its article_row."""
+        title, author, year, filename, count, list_counts, keyword_counts = (
+            row
+        )
+        article_id = self.__connection.execute(
+            "INSERT INTO articles (title, author, year, filename, count) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (title, author, year, filename, count)
+        ).lastrowid
+        self.__connection.executemany(
+            "INSERT INTO list_counts (article_id, list, count) "
+            "VALUES (?, ?, ?)",
+            [(article_id, name, count) for name, count in list_counts]
+        )
+        self.__connection.executemany(
+            "INSERT INTO keyword_counts (article_id, list, keyword, count) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (article_id, name, keyword, count)
+                for name, keyword, count in keyword_counts
+            ]
+        )
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+"""Scan server
+
+Keep the full texts of a bibtex in memory and answer keyword queries over
+HTTP, so keyword lists can be tried out without re-reading every PDF.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import time
+
+from extraction import BACKENDS, DEFAULT_BACKEND
+from full_text_scan import (
+    Article,
+    article_sort,
+    keyword_sentences,
+    profile_lists,
+    CSV_HEADER,
+)
+
+FORMATS = ["json", "csv"]
+
+
+def load_articles(bibtex_filename, text_dir=None, backend=DEFAULT_BACKEND):
+    """Read every article in the bibtex and load its sanitized text."""
+    if text_dir is not None:
+        text_dir = Path(text_dir).absolute()
+
+    with open(bibtex_filename, encoding='utf-8') as bibtex_file:
+        bib = bibtex_file.read()
+
+    old_cwd = os.getcwd()
+    p = Path(bibtex_filename)
+    os.chdir(p.parent.absolute())
+
+    articles = [
+        Article(article, text_dir=text_dir, backend=backend)
+        for article in bib.split("\n}")[:-1]
+    ]
+    for article in articles:
+        article.sanitized_text
+
+    os.chdir(old_cwd)
+    return articles
+
+
+def score(articles, keyword_lists):
+    """Score the articles against the keyword lists, as given by
+    profile_lists.
+    """
+    return sorted(
+        [article.rescored(**keyword_lists) for article in articles],
+        key=article_sort
+    )
+
+
+def as_dict(article):
+    return {
+        "title": article.title,
+        "author": article.author,
+        "year": article.year,
+        "filename": article.filename,
+        "count": article.keywords_count,
+    }
+
+
+def hits(articles, keyword):
+    """All lines that include the keyword, grouped by article."""
+    keyword = keyword.lower()
+    result = []
+    for article in articles:
+        count = article.sanitized_text.count(keyword)
+        if count:
+            result.append({
+                "title": article.title,
+                "author": article.author,
+                "year": article.year,
+                "filename": article.filename,
+                "count": count,
+                "sentences": keyword_sentences(article.text, [keyword]),
+            })
+    return sorted(result, key=lambda hit: hit["count"], reverse=True)
+
+
+class ScanHandler(BaseHTTPRequestHandler):
+    """Answers queries against the articles of the server.
+
+    GET  /        number of articles loaded
+    POST /score   {"keywords": [...], "ignore_keywords": [...],
+                   "exclude_major_keywords": [...],
+                   "exclude_minor_keywords": [...], "format": "json"|"csv"}
+    POST /hits    {"keyword": "..."}
+    """
+
+    def send(self, status, body, content_type="application/json"):
+        if content_type == "application/json":
+            body = json.dumps(body)
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type+"; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/":
+            self.send(200, {"articles": len(self.server.articles)})
+        else:
+            self.send(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            query = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(query, dict):
+                raise ValueError("A query should be a JSON object.")
+        except ValueError as error:
+            self.send(400, {"error": str(error)})
+            return
+
+        if self.path == "/score":
+            query_format = query.pop("format", "json")
+            try:
+                if query_format not in FORMATS:
+                    raise ValueError(
+                        "The format should be one of: " + ", ".join(FORMATS)
+                    )
+                keyword_lists = profile_lists(query, "the query")
+            except ValueError as error:
+                self.send(400, {"error": str(error)})
+                return
+            articles = score(self.server.articles, keyword_lists)
+            if query_format == "csv":
+                self.send(
+                    200,
+                    CSV_HEADER+"\n"+"\n".join(
+                        article.as_csv() for article in articles
+                    ),
+                    content_type="text/csv"
+                )
+            else:
+                self.send(200, [as_dict(article) for article in articles])
+        elif self.path == "/hits":
+            if set(query) != {"keyword"}:
+                self.send(
+                    400, {"error": "A query should only hold a keyword."}
+                )
+            elif not isinstance(query["keyword"], str) or not query["keyword"]:
+                self.send(
+                    400, {"error": "A keyword should be a non-empty string."}
+                )
+            else:
+                self.send(200, hits(self.server.articles, query["keyword"]))
+        else:
+            self.send(404, {"error": f"Unknown path {self.path}"})
+
+
+def main(
+        bibtex_filename, host="127.0.0.1", port=8765, text_dir=None,
+        backend=DEFAULT_BACKEND,
+):
+    start = time.perf_counter()
+    articles = load_articles(
+        bibtex_filename, text_dir=text_dir, backend=backend
+    )
+    print(
+        f"Loaded {len(articles)} articles in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+
+    server = ThreadingHTTPServer((host, port), ScanHandler)
+    server.articles = articles
+    print(f"Listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve keyword queries over full texts kept in memory."
+    )
+    parser.add_argument(
+        'bibtex',
+        metavar='BibTeX input',
+        type=str,
+        help='BibTex input filename'
+    )
+    parser.add_argument(
+        "--host",
+        help="Host to listen on",
+        default="127.0.0.1"
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        help="Port to listen on",
+        type=int,
+        default=8765
+    )
+    parser.add_argument(
+        "-t",
+        "--text-dir",
+        help="Directory to store extracted texts in and read them from",
+        default=None
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        help="How to extract the text from the PDFs",
+        choices=BACKENDS,
+        default=DEFAULT_BACKEND
+    )
+    args = parser.parse_args()
+    main(
+        bibtex_filename=args.bibtex,
+        host=args.host,
+        port=args.port,
+        text_dir=args.text_dir,
+        backend=args.backend
+    )
@@ -0,0 +1,219 @@
+"""Scheduler
+
+Load the texts of many articles in parallel, longest first. How long an
+article takes is predicted from the size and page count of its PDF, and from
+the times recorded in earlier runs. Jobs predicted to be heavy (very large
+PDFs) are limited to a few at a time, so that their memory use adds up less.
+
+Work runs in threads: extraction mostly waits on pdftotext, which runs as its
+own process. Backends that read the PDF in process are run in one worker only
+(see extraction.PARALLEL_BACKENDS).
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import mmap
+import os
+from pathlib import Path
+import queue
+import re
+import statistics
+import threading
+import time
+
+# Jobs with PDFs of at least this many pages or bytes are heavy
+HEAVY_PAGES = 300
+HEAVY_SIZE = 50 * 1024 * 1024
+
+# Guesses used until there are recorded times to learn from
+SECONDS_PER_PAGE = 0.05
+SECONDS_PER_BYTE = SECONDS_PER_PAGE / (50 * 1024)
+
+PAGE = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+def page_count(filename):
+    """Number of pages of the PDF, counted from its page objects without
+    parsing it. If unknown (e.g. pages in compressed streams), None.
+    """
+    try:
+        with open(filename, "rb") as pdf_file:
+            with mmap.mmap(
+                pdf_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as buffer:
+                pages = sum(1 for _ in PAGE.finditer(buffer))
+    except (OSError, ValueError):
+        return None
+    return pages or None
+
+
+class Job:
+    """An item to work on, with its predicted cost. By default the job costs
+    nothing, as for an item that is already cached.
+    """
+    def __init__(
+            self, item, order, key=None, size=0, pages=None, cost=0,
+            heavy=False,
+    ):
+        self.item = item
+        self.order = order
+        self.key = key
+        self.size = size
+        self.pages = pages
+        self.cost = cost
+        self.heavy = heavy
+
+
+class CostModel:
+    """Predicts the seconds a PDF takes, and learns from observed times.
+
+    Recorded times are kept per attachment key in a JSON file, with the size
+    and page count of the PDF at the time.
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.documents = {}
+        if filename is not None and Path(filename).exists():
+            with open(filename, encoding="utf-8") as timings_file:
+                self.documents = json.load(timings_file)["documents"]
+        self.__rates = None
+
+    @property
+    def rates(self):
+        """Seconds per page and per byte, from the recorded times."""
+        if self.__rates is None:
+            per_page = [
+                document["seconds"] / document["pages"]
+                for document in self.documents.values()
+                if document["pages"]
+            ]
+            per_byte = [
+                document["seconds"] / document["size"]
+                for document in self.documents.values()
+                if document["size"]
+            ]
+            self.__rates = (
+                statistics.median(per_page) if per_page else SECONDS_PER_PAGE,
+                statistics.median(per_byte) if per_byte else SECONDS_PER_BYTE,
+            )
+        return self.__rates
+
+    def job(self, item, order, key, filename):
+        """A job for the item, with the cost of reading the PDF."""
+        try:
+            size = os.path.getsize(filename) if filename else 0
+        except OSError:
+            size = 0
+        document = self.documents.get(key)
+        if document is not None and document["size"] == size:
+            pages = document["pages"]
+            cost = document["seconds"]
+        else:
+            pages = page_count(filename) if size else None
+            seconds_per_page, seconds_per_byte = self.rates
+            if pages:
+                cost = pages * seconds_per_page
+            else:
+                cost = size * seconds_per_byte
+        heavy = size >= HEAVY_SIZE or (pages or 0) >= HEAVY_PAGES
+        return Job(item, order, key, size, pages, cost, heavy)
+
+    def record(self, job, seconds):
+        """Record how long a job took."""
+        if job.size:
+            self.documents[job.key] = {
+                "seconds": seconds,
+                "size": job.size,
+                "pages": job.pages,
+            }
+
+    def save(self):
+        with open(self.filename, "w", encoding="utf-8") as timings_file:
+            json.dump({"documents": self.documents}, timings_file)
+
+
+def schedule(jobs, work, workers=1, max_heavy=1):
+    """Run work(job.item) for every job in worker threads, longest predicted
+    cost first, with at most max_heavy heavy jobs at a time. Yields each job
+    with the seconds it took, as the jobs finish.
+
+    A heavy job counts until the caller has finished with it and asks for the
+    next job, and at most as many jobs as there are workers wait to be
+    yielded, so that finished items do not pile up in memory.
+    """
+    if workers < 1 or max_heavy < 1:
+        raise ValueError("At least one worker and heavy job are needed.")
+    pending = sorted(jobs, key=lambda job: job.cost, reverse=True)
+    total = len(pending)
+    condition = threading.Condition()
+    finished = queue.Queue(maxsize=workers)
+    state = {"heavy": 0, "stop": False}
+
+    def next_job():
+        with condition:
+            while pending and not state["stop"]:
+                for i, job in enumerate(pending):
+                    if not job.heavy or state["heavy"] < max_heavy:
+                        if job.heavy:
+                            state["heavy"] += 1
+                        return pending.pop(i)
+                condition.wait()
+            return None
+
+    def worker():
+        job = next_job()
+        while job is not None:
+            start = time.perf_counter()
+            try:
+                work(job.item)
+                error = None
+            except BaseException as exception:
+                error = exception
+            seconds = time.perf_counter() - start
+            finished.put((job, seconds, error))
+            job = next_job()
+
+    threads = [
+        threading.Thread(target=worker, daemon=True)
+        for _ in range(min(workers, total))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in range(total):
+            job, seconds, error = finished.get()
+            if error is not None:
+                raise error
+            yield job, seconds
+            if job.heavy:
+                with condition:
+                    state["heavy"] -= 1
+                    condition.notify_all()
+    finally:
+        with condition:
+            state["stop"] = True
+            condition.notify_all()
+        for thread in threads:
+            # Workers may be waiting to put a finished job
+            while thread.is_alive():
+                try:
+                    finished.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
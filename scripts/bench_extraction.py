@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Compare the extraction backends on the PDFs of a bibtex: time per document,
+# characters extracted and how often the text matches the first backend.
+
+import argparse
+import os
+from pathlib import Path
+import sys
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from extraction import BACKENDS, extract_text, is_available
+from full_text_scan import Article
+
+def benchmark(filenames, backend, repeat):
+    timings = []
+    texts = []
+    for filename in filenames:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = extract_text(filename, backend) or ""
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        timings.append(best)
+        texts.append(text)
+    return timings, texts
+
+def main(bibtex_filename, backends, repeat):
+    with open(bibtex_filename, encoding='utf-8') as bibtex_file:
+        bib = bibtex_file.read()
+
+    old_cwd = os.getcwd()
+    p = Path(bibtex_filename)
+    os.chdir(p.parent.absolute())
+
+    filenames = [
+        article.filename
+        for article in (Article(raw) for raw in bib.split("\n}")[:-1])
+        if article.filename
+    ]
+
+    print(
+        f"{len(filenames)} PDFs, best of {repeat} run(s) per document\n"
+    )
+    print(
+        f"{'backend':<10} {'total s':>8} {'mean ms':>8} {'max ms':>8} "
+        f"{'empty':>6} {'chars':>10} {'same':>5}"
+    )
+    reference = None
+    for backend in backends:
+        if not is_available(backend):
+            print(f"{backend:<10} not installed")
+            continue
+        timings, texts = benchmark(filenames, backend, repeat)
+        if reference is None:
+            reference = texts
+        same = sum(text == ref for text, ref in zip(texts, reference))
+        print(
+            f"{backend:<10} "
+            f"{sum(timings):>8.2f} "
+            f"{1000 * sum(timings) / max(len(timings), 1):>8.1f} "
+            f"{1000 * max(timings, default=0):>8.1f} "
+            f"{sum(not text for text in texts):>6} "
+            f"{sum(len(text) for text in texts):>10} "
+            f"{same:>5}"
+        )
+
+    os.chdir(old_cwd)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the extraction backends on a bibtex's PDFs."
+    )
+    parser.add_argument(
+        'bibtex',
+        metavar='BibTeX input',
+        type=str,
+        help='BibTex input filename'
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        help="Backend to compare (default: all). Can be given more than once.",
+        choices=BACKENDS,
+        action="append",
+        default=None
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        help="Runs per document; the fastest run counts",
+        type=int,
+        default=1
+    )
+    args = parser.parse_args()
+    main(
+        bibtex_filename=args.bibtex,
+        backends=args.backend or list(BACKENDS),
+        repeat=args.repeat
+    )
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# Time ways of counting the default keywords over a corpus pack: decoding each
+# text and counting the str (what CorpusPack.text does), copying its bytes out
+# of the map and counting them, and counting a regex over the map without
+# copying. Without a pack, a synthetic one is made.
+
+import argparse
+import json
+import mmap
+from pathlib import Path
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from corpus_pack import HEADER, write_pack
+from full_text_scan import (
+    DEFAULT_KEYWORDS,
+    IGNORE_KEYWORDS,
+    EXCLUDE_MAJOR_KEYWORDS,
+    EXCLUDE_MINOR_KEYWORDS,
+)
+
+KEYWORDS = (
+    DEFAULT_KEYWORDS + IGNORE_KEYWORDS
+    + EXCLUDE_MAJOR_KEYWORDS + EXCLUDE_MINOR_KEYWORDS
+    + [" the ", " a "]
+)
+
+def synthetic_texts(documents, words):
+    random.seed(0)
+    vocabulary = [
+        "the", "a", "peak", "alpha", "frequency", "iaf", "paf", "eeg",
+        "power", "abstract", "poster", "of", "and", "individual", "mean",
+    ]
+    for i in range(documents):
+        yield (
+            str(i),
+            " ".join(random.choice(vocabulary) for _ in range(words)),
+            True,
+            None,
+        )
+
+def spans(pack_filename):
+    """Offset and length of every text in the pack."""
+    with open(pack_filename, "rb") as pack_file:
+        _, index_offset = HEADER.unpack(pack_file.read(HEADER.size))
+        pack_file.seek(index_offset)
+        return [entry[:2] for entry in json.loads(pack_file.read()).values()]
+
+def count_decoded(buffer, spans):
+    total = 0
+    for offset, length in spans:
+        text = buffer[offset:offset+length].decode("utf-8")
+        total += sum(text.count(keyword) for keyword in KEYWORDS)
+    return total
+
+def count_bytes(buffer, spans):
+    keywords = [keyword.encode("utf-8") for keyword in KEYWORDS]
+    total = 0
+    for offset, length in spans:
+        data = buffer[offset:offset+length]
+        total += sum(data.count(keyword) for keyword in keywords)
+    return total
+
+def count_mapped(buffer, spans):
+    patterns = [
+        re.compile(re.escape(keyword.encode("utf-8"))) for keyword in KEYWORDS
+    ]
+    total = 0
+    for offset, length in spans:
+        total += sum(
+            len(pattern.findall(buffer, offset, offset+length))
+            for pattern in patterns
+        )
+    return total
+
+def main(pack_filename, documents, words, repeat):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if pack_filename is None:
+            pack_filename = Path(tmp_dir).joinpath("synthetic.pack")
+            write_pack(pack_filename, synthetic_texts(documents, words))
+            print(f"Synthetic pack: {documents} documents of {words} words")
+        with open(pack_filename, "rb") as pack_file, mmap.mmap(
+                pack_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as buffer:
+            text_spans = spans(pack_filename)
+            results = {}
+            for name, count in [
+                ("decoded str", count_decoded),
+                ("copied bytes", count_bytes),
+                ("regex on map", count_mapped),
+            ]:
+                best = None
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    results[name] = count(buffer, text_spans)
+                    seconds = time.perf_counter() - start
+                    best = seconds if best is None else min(best, seconds)
+                print(f"{name:<13} {best:.3f}s")
+            assert len(set(results.values())) == 1, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time counting keywords over a corpus pack."
+    )
+    parser.add_argument(
+        "pack",
+        metavar="Pack input",
+        type=Path,
+        nargs="?",
+        default=None,
+        help="Corpus pack (default: a synthetic pack)"
+    )
+    parser.add_argument(
+        "-d", "--documents", type=int, default=20,
+        help="Documents in the synthetic pack"
+    )
+    parser.add_argument(
+        "-w", "--words", type=int, default=1000000,
+        help="Words per document in the synthetic pack"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3,
+        help="Runs; the fastest counts"
+    )
+    args = parser.parse_args()
+    main(
+        pack_filename=args.pack,
+        documents=args.documents,
+        words=args.words,
+        repeat=args.repeat
+    )
@@ -1,6 +1,12 @@
 #!/usr/bin/env python
 
+from pathlib import Path
 import re
+import sqlite3
+
+# SQLite output of full_text_scan.py (--sqlite). If it exists, the titles are
+# read from it instead of matching results.csv against the bibtex.
+RESULTS_DB = "results.sqlite"
 
 class Article:
     def __init__(self, text):
@@ -27,17 +33,19 @@ class Article:
     def title(self):
         def get_title(text):
             try:
-                return re.search(
-                    r"(?<=title = \{).+?(?=\},)",
-                    text
-                ).group(0).
-                strip().
-                replace("\n", " ").
-                replace(";",",").
-                replace("\"","").
-                replace("'", "").
-                replace("{","").
-                replace("}","")
+                return (
+                    re.search(
+                        r"(?<=title = \{).+?(?=\},)",
+                        text
+                    ).group(0).
+                    strip().
+                    replace("\n", " ").
+                    replace(";",",").
+                    replace("\"","").
+                    replace("'", "").
+                    replace("{","").
+                    replace("}","")
+                )
             except:
                 return ""
         if self.__title is None:
@@ -59,26 +67,47 @@ class Article:
         return self.__filename
 
 
-with open("results.csv") as f:
-    csv = f.readlines()
+def from_results_db():
+    with sqlite3.connect(RESULTS_DB) as connection:
+        rows = connection.execute(
+            "SELECT filename, count, author, title FROM articles "
+            "ORDER BY count, year, author, title"
+        ).fetchall()
+    csv = ["filename;count;author;title"]
+    for filename, count, author, title in rows:
+        csv.append(f"{filename};{count};{author};{title}")
+    return csv
+
+
+def from_results_csv():
+    with open("results.csv") as f:
+        csv = f.readlines()
+
+    with open("/path/to/bibtex.bib") as f:
+        bib = f.read()
+
+    articles = bib.split("\n}\n")[:-1]
+
+    articles = [Article(article) for article in articles]
 
-with open("/path/to/bibtex.bib") as f:
-    bib = f.read()
+    csv[0] = csv[0][:-1] + ";author;title"
 
-articles = bib.split("\n}\n")[:-1]
+    for i, row in enumerate(csv[1:], 1):
+        filename = row.split(";")[0][84:]
+        found = False
+        for article in articles:
+            if filename in article.filename:
+                found = True
+                csv[i] = csv[i][:-1] + ";" + article.author + ";" + article.title
+                break
 
-articles = [Article(article) for article in articles]
+    return csv
 
-csv[0] = csv[0][:-1] + ";author;title"
 
-for i, row in enumerate(csv[1:], 1):
-    filename = row.split(";")[0][84:]
-    found = False
-    for article in articles:
-        if filename in article.filename:
-            found = True
-            csv[i] = csv[i][:-1] + ";" + article.author + ";" + article.title
-            break
+if Path(RESULTS_DB).exists():
+    csv = from_results_db()
+else:
+    csv = from_results_csv()
 
 with open("new_results.csv", "w") as f:
     f.write("\n".join(csv))
@@ -0,0 +1,177 @@
+"""Sorted output
+
+Write the markdown, CSV and SQLite outputs in article_sort order without
+keeping every article in memory. The output of each article is buffered as it
+is added; when the buffer is full it is sorted and written to a run file on
+disk. Closing the output merges the runs into the output files.
+"""
+
+# Full text scan - Search full text pdfs for keywords.
+
+# Copyright 2021, Christian Christiansen
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from contextlib import ExitStack
+import heapq
+import json
+from pathlib import Path
+import tempfile
+
+from results_db import ResultsDB, article_row
+
+# Characters of output (markdown, CSV and SQLite rows as JSON) kept in memory
+# before a run is written to disk
+BUFFER_SIZE = 32 * 1024 * 1024
+
+# Runs merged at once. With more runs, they are first merged into longer runs.
+MAX_MERGE = 64
+
+
+def read_run(filename):
+    with open(filename, encoding="utf-8") as run_file:
+        for line in run_file:
+            yield json.loads(line)
+
+
+def write_run(filename, records):
+    with open(filename, "w", encoding="utf-8") as run_file:
+        for record in records:
+            run_file.write(json.dumps(record)+"\n")
+
+
+class SortedOutput:
+    """Outputs of articles, sorted by the sort key when the output is closed.
+
+    Articles with the same sort key keep the order in which they were added,
+    as with sorted().
+    """
+    def __init__(
+            self, sort_key, *,
+            markdown=None, csv=None, sqlite=None, csv_header="",
+            buffer_size=BUFFER_SIZE,
+    ):
+        self.sort_key = sort_key
+        self.markdown = markdown
+        self.csv = csv
+        self.sqlite = sqlite
+        self.csv_header = csv_header
+        self.buffer_size = buffer_size
+        self.__buffer = []
+        self.__buffered = 0
+        self.__added = 0
+        self.__runs = []
+        self.__run_count = 0
+        self.__tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.__tmp_dir is not None:
+            self.__tmp_dir.cleanup()
+
+    def add(self, article, order=None):
+        """Add the outputs of an article. The article is not kept.
+
+        Articles with the same sort key are written in order; by default
+        this is the order in which they were added.
+        """
+        # A list, as the key is once it has been read back from a run
+        record = [
+            list(self.sort_key(article)),
+            self.__added if order is None else order,
+            article.as_markdown() if self.markdown else None,
+            article.as_csv() if self.csv else None,
+            article_row(article) if self.sqlite else None,
+        ]
+        self.__added += 1
+        self.__buffer.append(record)
+        self.__buffered += len(record[2] or "") + len(record[3] or "")
+        if record[4] is not None:
+            # The per-keyword counts make the SQLite row the largest part
+            # when it is the only output.
+            self.__buffered += len(json.dumps(record[4]))
+        if self.__buffered >= self.buffer_size:
+            self.__spill()
+
+    def __new_run(self):
+        if self.__tmp_dir is None:
+            self.__tmp_dir = tempfile.TemporaryDirectory(prefix="ft-scan-")
+        run = Path(self.__tmp_dir.name).joinpath(f"{self.__run_count}.run")
+        self.__run_count += 1
+        self.__runs.append(run)
+        return run
+
+    def __spill(self):
+        """Write the buffer to disk as a sorted run."""
+        self.__buffer.sort(key=lambda record: record[:2])
+        write_run(self.__new_run(), self.__buffer)
+        self.__buffer = []
+        self.__buffered = 0
+
+    def __merged(self):
+        """All records, in order."""
+        self.__buffer.sort(key=lambda record: record[:2])
+        while len(self.__runs) > MAX_MERGE:
+            runs = self.__runs[:MAX_MERGE]
+            self.__runs = self.__runs[MAX_MERGE:]
+            write_run(
+                self.__new_run(),
+                heapq.merge(
+                    *(read_run(run) for run in runs),
+                    key=lambda record: record[:2]
+                )
+            )
+            for run in runs:
+                run.unlink()
+        return heapq.merge(
+            iter(self.__buffer),
+            *(read_run(run) for run in self.__runs),
+            key=lambda record: record[:2]
+        )
+
+    def close(self):
+        """Merge everything that was added into the output files."""
+        with ExitStack() as stack:
+            markdown_file = csv_file = results = None
+            if self.markdown:
+                markdown_file = stack.enter_context(
+                    open(self.markdown, "w", encoding="utf-8")
+                )
+            if self.csv:
+                csv_file = stack.enter_context(
+                    open(self.csv, "w", encoding="utf-8")
+                )
+                csv_file.write(self.csv_header+"\n")
+            if self.sqlite:
+                results = stack.enter_context(ResultsDB(self.sqlite))
+
+            separator = ""
+            for _, _, markdown, csv, row in self.__merged():
+                if markdown_file is not None:
+                    markdown_file.write(separator+markdown)
+                if csv_file is not None:
+                    csv_file.write(separator+csv)
+                if results is not None:
+                    results.add_row(row)
+                separator = "\n"
+
+        self.__buffer = []
+        if self.__tmp_dir is not None:
+            self.__tmp_dir.cleanup()
+            self.__tmp_dir = None
+        self.__runs = []